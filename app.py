@@ -4,9 +4,15 @@ Simple, clean interface for AI debris detection
 """
 
 import streamlit as st
+from streamlit.runtime.uploaded_file_manager import UploadedFile
 from PIL import Image
+import numpy as np
 import os
+import shutil
+import hashlib
+import threading
 import time
+from io import BytesIO
 from pathlib import Path
 
 st.set_page_config(
@@ -15,143 +21,470 @@ st.set_page_config(
     layout="wide"
 )
 
-# BULLETPROOF high-contrast CSS - works in light AND dark mode
-st.markdown("""
-<style>
-    /* Force light theme */
-    .stApp, [data-testid="stAppViewContainer"], [data-testid="stHeader"] {
-        background-color: #ffffff !important;
-    }
 
-    /* ALL text must be dark */
-    body, p, span, div, label, h1, h2, h3, h4, h5, h6,
-    .stMarkdown, .stMarkdown p, .stMarkdown span,
-    [data-testid="stMarkdownContainer"],
-    [data-testid="stMarkdownContainer"] p,
-    [data-testid="stMarkdownContainer"] span {
-        color: #000000 !important;
-    }
+# Where the app writes uploads and results, and its disk budget
+OUTPUT_DIR = Path("./output")
+MAX_OUTPUT_FILES = 16
+OUTPUT_TTL_SECONDS = 3600
+
+# Longest image side handed to SAM when tiling is off
+MAX_SAM_SIDE = 1024
+# Longest side of the in-browser previews
+PREVIEW_MAX_SIDE = 1200
+
+# Better prompts for hurricane debris detection: sidebar category ->
+# (prompt, display name) pairs
+CATEGORY_PROMPTS = {
+    "Debris Piles": [
+        ("pile of garbage on street", "Street Debris"),
+        ("heap of broken wood and materials", "Material Piles"),
+        ("scattered debris near houses", "Yard Debris"),
+    ],
+    "Rubble": [
+        ("broken concrete and bricks", "Rubble"),
+        ("demolished building materials", "Construction"),
+    ],
+    "Blue Tarps": [
+        ("blue tarp on roof", "Blue Tarps"),
+        ("blue plastic sheet covering damage", "Tarped Roofs"),
+    ],
+    "Damaged Vehicles": [
+        ("overturned car", "Vehicles"),
+    ],
+}
+
+
+@st.cache_resource(show_spinner=False)
+def get_sam():
+    """Load LangSAM once per server process and share it across reruns."""
+    os.environ['PYTORCH_ENABLE_MPS_FALLBACK'] = '1'
+    from fast_langsam import FastLangSAM
+    sam = FastLangSAM(precision="bf16" if os.environ.get('USE_BF16') == '1' else "fp16")
+    if os.environ.get('USE_INT8') == '1':
+        sam.quantize_int8()
+    if os.environ.get('USE_COMPILE') == '1':
+        sam.compile_encoder()
+        sam.compile_decoder()
+    sam.warmup()
+    return sam
+
+
+@st.cache_resource(show_spinner=False)
+def preload_heavy_modules():
+    """
+    Load the model in a background thread, once per process.
+
+    Importing torch/samgeo, loading the weights and warming up CUDA take
+    several seconds; starting at app load overlaps that with the user
+    picking a file, so the first detection finds get_sam() already cached.
+    """
+    thread = threading.Thread(target=get_sam, daemon=True)
+    thread.start()
+    return thread
+
+
+@st.cache_resource(show_spinner=False)
+def preencode_upload(path):
+    """
+    Start the SAM image encoder on a new upload in the background.
+
+    Runs once per (content-addressed) path, while the user is still
+    choosing settings; DETECT DEBRIS then reuses the cached features.
+    """
+    thread = threading.Thread(target=lambda: get_sam().encode_image(path), daemon=True)
+    thread.start()
+    return thread
+
+
+def decode_upload(uploaded_file):
+    """
+    Decode an uploaded image straight from the upload's buffer.
+
+    UploadedFile is already a BytesIO, so PIL reads it in place instead of
+    going through a getvalue() copy of the whole file. JPEGs are decoded
+    with libjpeg's DCT scaling down to the smallest power-of-two reduction
+    that still covers MAX_SAM_SIDE: the preview and the SAM input are both
+    smaller than that, and tiling reads the original file from disk.
+
+    Returns:
+        (PIL RGB image, (full width, full height))
+    """
+    uploaded_file.seek(0)
+    image = Image.open(uploaded_file)
+    full_size = image.size
+    if image.format == 'JPEG':
+        image.draft('RGB', (MAX_SAM_SIDE, MAX_SAM_SIDE))
+    return image.convert('RGB'), full_size
+
+
+def hash_upload(uploaded_file):
+    """
+    Content hash of an upload, used for its file names.
+
+    Hashes a zero-copy view of the upload's buffer; the view is released
+    right away, since a BytesIO with a live export can't be closed or
+    freed.
+    """
+    with uploaded_file.getbuffer() as view:
+        return hashlib.blake2b(view, digest_size=8).hexdigest()
+
+
+def write_upload(uploaded_file, path):
+    """
+    Stream an upload to disk in 4 MB chunks.
+
+    Written to a .part file and renamed, so an interrupted write never
+    leaves a file that looks complete. The .part name is unique to this
+    writer, so two sessions uploading the same image don't share one.
+    """
+    partial = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.part")
+    for _ in range(2):
+        uploaded_file.seek(0)
+        with open(partial, "wb") as f:
+            shutil.copyfileobj(uploaded_file, f, length=4 * 1024 * 1024)
+        try:
+            os.replace(partial, path)
+            break
+        except FileNotFoundError:
+            # Removed by a concurrent cleanup; write it once more
+            continue
+    prune_outputs(path.parent)
+
+
+def prune_outputs(output_dir):
+    """
+    Bound disk use on shared servers by evicting old app-written files.
+
+    Keeps the MAX_OUTPUT_FILES most recent uploads/results and drops any
+    older than OUTPUT_TTL_SECONDS. Files are content-addressed, so a
+    session that still needs an evicted upload simply rewrites it.
+    In-flight .part files are never counted or evicted while another
+    session may still be writing them; only abandoned ones past the TTL
+    are removed.
+    """
+    cutoff = time.time() - OUTPUT_TTL_SECONDS
+    files, stale_parts = [], []
+    for entry in os.scandir(output_dir):
+        if not (entry.is_file() and entry.name.startswith(("uploaded_", "result_"))):
+            continue
+        try:
+            mtime = entry.stat().st_mtime
+        except FileNotFoundError:
+            continue
+        if entry.name.endswith(".part"):
+            if mtime < cutoff:
+                stale_parts.append(entry.path)
+        else:
+            files.append((mtime, entry.path))
+
+    files.sort(reverse=True)
+    evict = [path for i, (mtime, path) in enumerate(files)
+             if i >= MAX_OUTPUT_FILES or mtime < cutoff]
+    for path in evict + stale_parts:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
 
-    /* Red header - WHITE text */
-    .header {
-        background: #c62828 !important;
-        padding: 20px;
-        border-radius: 8px;
-        margin-bottom: 20px;
-    }
-    .header h1 { color: #ffffff !important; font-size: 28px; margin: 0 0 8px 0; }
-    .header p { color: #ffffff !important; margin: 0; }
-
-    /* Warning box - BLACK text on YELLOW */
-    .warning {
-        background: #fff3cd !important;
-        border: 2px solid #ffc107;
-        border-radius: 8px;
-        padding: 16px;
-        margin: 16px 0;
-    }
-    .warning, .warning strong, .warning span, .warning p {
-        color: #000000 !important;
-    }
-    .warning a { color: #0000cc !important; text-decoration: underline; }
-
-    /* Section headers - WHITE text on DARK */
-    .section {
-        background: #222222 !important;
-        padding: 12px 16px;
-        border-radius: 6px;
-        margin: 16px 0 12px 0;
-        font-weight: bold;
-        font-size: 16px;
-    }
-    .section, .section * { color: #ffffff !important; }
-
-    /* Info box - BLACK text on LIGHT BLUE */
-    .info {
-        background: #cce5ff !important;
-        border: 2px solid #004085;
-        border-radius: 8px;
-        padding: 16px;
-        margin: 12px 0;
-    }
-    .info, .info strong, .info span, .info p, .info br {
-        color: #000000 !important;
-    }
 
-    /* Success box - BLACK text on LIGHT GREEN */
-    .success {
-        background: #d4edda !important;
-        border: 2px solid #28a745;
-        border-radius: 8px;
-        padding: 16px;
-        margin: 12px 0;
-    }
-    .success, .success strong, .success span, .success p {
-        color: #000000 !important;
-    }
-
-    /* Metrics - RED numbers on WHITE */
-    .metric {
-        background: #ffffff !important;
-        border: 2px solid #cccccc;
-        border-radius: 8px;
-        padding: 20px;
-        text-align: center;
-    }
-    .metric-value {
-        font-size: 48px !important;
-        font-weight: bold !important;
-        color: #c62828 !important;
-    }
-    .metric-label {
-        font-size: 14px;
-        color: #333333 !important;
-        text-transform: uppercase;
+def preview_jpeg(image, path):
+    """
+    Write a JPEG preview of an upload, resized for display.
+
+    st.image is given this path rather than the PIL image, so the full-size
+    image is never PNG-encoded on a rerun and session state holds a short
+    string instead of the encoded bytes.
+    """
+    preview = image.copy()
+    preview.thumbnail((PREVIEW_MAX_SIDE, PREVIEW_MAX_SIDE), Image.LANCZOS)
+    preview.save(path, 'JPEG', quality=85)
+
+
+def load_tiff(path):
+    """
+    Load a TIFF upload through a memory map.
+
+    Only every Nth row/column is read, so a huge raster never has to be
+    decoded in full. The result is at least MAX_SAM_SIDE on its long side
+    (unless the source is smaller). Compressed or tiled TIFFs that can't be
+    memory-mapped fall back to PIL.
+
+    Args:
+        path: Content-addressed TIFF on disk
+
+    Returns:
+        (PIL RGB image, (full width, full height))
+    """
+    import tifffile
+
+    try:
+        arr = tifffile.memmap(path, mode='r')
+    except ValueError:
+        image = Image.open(path).convert('RGB')
+        return image, image.size
+
+    # Planar (bands, rows, cols) rasters -> (rows, cols, bands)
+    if arr.ndim == 3 and arr.shape[0] <= 4 < arr.shape[2]:
+        arr = arr.transpose(1, 2, 0)
+    full_size = (arr.shape[1], arr.shape[0])
+
+    step = max(1, max(full_size) // MAX_SAM_SIDE)
+    view = np.asarray(arr[::step, ::step, :3] if arr.ndim == 3 else arr[::step, ::step])
+    if view.dtype != np.uint8:
+        view = (view.astype(np.float32) * (255.0 / max(float(view.max()), 1.0))).astype(np.uint8)
+    return Image.fromarray(view).convert('RGB'), full_size
+
+
+def build_upload(uploaded_file, tile_mode):
+    """
+    Persist an upload and build everything the page needs from it.
+
+    Files use content-addressed names and are only written if missing:
+    re-uploading the same image reuses the file on disk and keeps
+    path-keyed caches warm, and calling this again after prune_outputs()
+    evicted a file recreates it under the same name.
+
+    Returns:
+        (upload hash, path of the SAM input, path of the JPEG preview,
+        (full width, full height), SAM input width / full width)
+    """
+    # Only reached on a cache miss, so this is not a per-rerun syscall
+    output_dir = OUTPUT_DIR
+    output_dir.mkdir(exist_ok=True)
+
+    upload_hash = hash_upload(uploaded_file)
+    ext = uploaded_file.name.split('.')[-1]
+    raw_path = output_dir / f"uploaded_{upload_hash}.{ext}"
+
+    if ext.lower() in ('tif', 'tiff'):
+        # Memory-map TIFFs from disk rather than decoding the full raster
+        if not raw_path.exists():
+            write_upload(uploaded_file, raw_path)
+        image, full_size = load_tiff(str(raw_path))
+    else:
+        image, full_size = decode_upload(uploaded_file)
+
+    preview_path = output_dir / f"uploaded_{upload_hash}_preview.jpg"
+    if not preview_path.exists():
+        preview_jpeg(image, preview_path)
+
+    if not tile_mode and max(full_size) > MAX_SAM_SIDE:
+        # SAM resizes to 1024px internally; downscale up front so large
+        # uploads aren't re-read and re-decoded at full size. JPEG decodes
+        # several times faster than PNG at this size.
+        sam_input = image.copy()
+        sam_input.thumbnail((MAX_SAM_SIDE, MAX_SAM_SIDE), Image.LANCZOS)
+        sam_path = output_dir / f"uploaded_{upload_hash}_{MAX_SAM_SIDE}px.jpg"
+        if not sam_path.exists():
+            sam_input.save(sam_path, 'JPEG', quality=90)
+            prune_outputs(output_dir)
+        scale = sam_input.width / full_size[0]
+    else:
+        sam_path = raw_path
+        if not raw_path.exists():
+            write_upload(uploaded_file, raw_path)
+        scale = 1.0
+
+    return upload_hash, str(sam_path), str(preview_path), full_size, scale
+
+
+@st.cache_data(show_spinner=False, hash_funcs={UploadedFile: lambda f: f.file_id})
+def prepare_upload(uploaded_file, tile_mode):
+    """
+    build_upload(), cached per uploaded file and tiling mode.
+
+    Reruns skip the hashing, disk writes and decoding entirely. The
+    decoded image itself is never cached, only the paths and sizes.
+    """
+    return build_upload(uploaded_file, tile_mode)
+
+
+def combined_prompt(prompts):
+    """GroundingDINO caption covering every (prompt, display name) pair."""
+    from fast_langsam import combined_caption
+    return combined_caption([prompt for prompt, _ in prompts])
+
+
+def count_by_prompt(phrases, prompts):
+    """
+    Count detections per prompt from the phrases of a combined prompt.
+
+    Returns:
+        int32 array of counts, indexed like prompts
+    """
+    from fast_langsam import match_phrases
+    matches = match_phrases(phrases, [prompt for prompt, _ in prompts])
+    return np.bincount(matches, minlength=len(prompts)).astype(np.int32)
+
+
+@st.cache_data(show_spinner=False)
+def build_prompts(selected):
+    """
+    (prompt, display name) pairs for the selected categories.
+
+    Returned as a tuple so it is a stable, hashable key for the caches
+    downstream (detection, CSV export).
+    """
+    return tuple(p for name in CATEGORY_PROMPTS if name in selected for p in CATEGORY_PROMPTS[name])
+
+
+def render_annotations(sam):
+    """
+    Render the model's current detections with show_anns as JPEG bytes.
+
+    Not cached itself: it only runs inside run_detection, whose cache
+    already keeps the rendered bytes per detection key. show_anns hands
+    output straight to plt.savefig, so the figure is encoded into memory
+    rather than written to disk and read back; an overlay tolerates lossy
+    output and encodes and displays faster than PNG.
+
+    Only call this when the last prediction found something: for an empty
+    one, show_anns still plots the source image and title.
+
+    Returns:
+        JPEG bytes
+    """
+    import matplotlib.pyplot as plt
+
+    buffer = BytesIO()
+    with sam.lock:
+        sam.show_anns(
+            cmap="Reds",
+            add_boxes=True,
+            alpha=0.5,
+            title="Detection Results",
+            output=buffer,
+            format="jpeg",
+        )
+    plt.close('all')
+    return buffer.getvalue()
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def run_detection(_sam, upload_hash, _image_path, sensitivity, prompts, tile_mode):
+    """
+    Detect every prompt on an upload and draw the overlay.
+
+    Keyed on the upload's content hash and the detection settings (the SAM
+    input path follows from those), so clicking detect again with the same
+    inputs returns the counts and overlay without running the model.
+    Failed predictions raise and are not cached. A failed render is
+    returned rather than shown with st.warning, which a cache hit would
+    replay on every later rerun.
+
+    Returns:
+        (int32 counts indexed like prompts, overlay JPEG bytes or None,
+        render error message or None)
+    """
+    # The model is shared by every session and keeps its last result on
+    # itself, so hold its lock from predict() until the overlay is drawn
+    with _sam.lock:
+        # GroundingDINO accepts several phrases separated by " . ", so a
+        # single predict call covers every category and the image is only
+        # encoded once instead of once per prompt.
+        predict = _sam.predict_tiles if tile_mode else _sam.predict
+        prediction = predict(
+            image=_image_path,
+            text_prompt=combined_prompt(prompts),
+            box_threshold=sensitivity,
+            text_threshold=sensitivity,
+            return_results=True,
+        )
+        # An empty detection comes back as empty boxes (None from
+        # predict_tiles); there is nothing to count, and no overlay is
+        # drawn, since render_annotations would still plot the bare image
+        from fast_langsam import has_detections
+        if not has_detections(prediction):
+            return np.zeros(len(prompts), dtype=np.int32), None, None
+        counts = count_by_prompt(prediction[2], prompts)
+        try:
+            return counts, render_annotations(_sam), None
+        except Exception as e:
+            return counts, None, f"Could not draw the detections: {e}"
+
+
+def results_to_csv(categories, counts):
+    """
+    CSV report from the category and count columns.
+
+    Category names come from CATEGORY_PROMPTS and contain no commas, so a
+    plain join is enough and pandas never has to be imported.
+
+    Args:
+        categories: Display name per prompt
+        counts: Detection count per prompt (array)
+    """
+    rows = map("{},{}\n".format, categories, counts.tolist())
+    return ("Category,Count\n" + "".join(rows)).encode()
+
+
+def metric_html(value, label):
+    """HTML for one metric card."""
+    return f"""
+    <div class="metric">
+        <div class="metric-value">{value}</div>
+        <div class="metric-label">{label}</div>
+    </div>
+    """
+
+
+def build_results_view(categories, counts):
+    """
+    Everything the results panel displays, built once when a detection run
+    finishes. Reruns of the panel then only write these precomputed values.
+
+    Args:
+        categories: Display name per prompt
+        counts: Detection count per prompt
+
+    Returns:
+        dict with the total, the four metric cards' HTML and the CSV bytes
+    """
+    total = int(counts.sum())
+    return {
+        "total": total,
+        "metrics_html": [metric_html(total, "Total Found")] + [
+            metric_html(count, name) for name, count in zip(categories[:3], counts[:3].tolist())
+        ],
+        "csv": results_to_csv(categories, counts),
     }
 
-    /* Buttons - WHITE text on RED */
-    .stButton > button {
-        background: #c62828 !important;
-        color: #ffffff !important;
-        border: none !important;
-        padding: 12px 24px !important;
-        font-size: 16px !important;
-        font-weight: bold !important;
-    }
-    .stButton > button:hover {
-        background: #a52020 !important;
-        color: #ffffff !important;
-    }
-    .stButton > button:disabled {
-        background: #888888 !important;
-        color: #ffffff !important;
-    }
 
-    /* Sidebar - BLACK text on WHITE */
-    [data-testid="stSidebar"] {
-        background: #f5f5f5 !important;
-    }
-    [data-testid="stSidebar"] * {
-        color: #000000 !important;
-    }
+@st.cache_data(show_spinner=False)
+def critical_css():
+    """
+    Above-the-fold rules (theme, header, warning) from static/app.css,
+    read once per process and inlined so the first paint is styled before
+    the linked stylesheet arrives.
+    """
+    css = (Path(__file__).parent / "static" / "app.css").read_text()
+    return css.split("/* end critical */")[0]
+
+
+# BULLETPROOF high-contrast CSS - works in light AND dark mode.
+# Served from static/app.css so the browser caches it; each rerun only
+# sends this link tag and the small critical block instead of the full
+# stylesheet.
+st.markdown(
+    f'<style>{critical_css()}</style>'
+    '<link rel="stylesheet" href="app/static/app.css">',
+    unsafe_allow_html=True,
+)
 
-    /* File uploader */
-    [data-testid="stFileUploader"] {
-        background: #ffffff !important;
-    }
-    [data-testid="stFileUploader"] * {
-        color: #000000 !important;
-    }
-</style>
-""", unsafe_allow_html=True)
+preload_heavy_modules()
 
 # Initialize state
-if 'detection_complete' not in st.session_state:
-    st.session_state.detection_complete = False
-if 'results' not in st.session_state:
-    st.session_state.results = None
-if 'uploaded_image' not in st.session_state:
-    st.session_state.uploaded_image = None
+for key, default in {
+    "detection_complete": False,
+    "results_view": None,
+    "uploaded_image": None,
+    "final_result": None,
+    "render_error": None,
+    "uploaded_preview": None,
+    "upload_hash": None,
+    "sam_scale": 1.0,
+}.items():
+    st.session_state.setdefault(key, default)
 
 # Header
 st.markdown("""
@@ -173,23 +506,48 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Sidebar
-with st.sidebar:
+@st.fragment
+def render_settings():
+    """
+    Sidebar settings. As a fragment, changing a widget reruns only this
+    block; it leaves the resulting settings in session_state.detect_cfg
+    for the main script, which reads them on the next full rerun (the
+    detect button click).
+    """
     st.markdown("### Settings")
 
-    sensitivity = st.slider("Detection Sensitivity", 0.10, 0.40, 0.20, 0.02)
+    st.slider("Detection Sensitivity", 0.10, 0.40, 0.20, 0.02, key="sensitivity")
+    st.checkbox(
+        "Tile large images", value=False, key="tile_mode",
+        help="Scan large imagery in overlapping tiles at full resolution instead of downscaling it"
+    )
 
     st.markdown("---")
     st.markdown("### What to Detect")
-    detect_debris = st.checkbox("Debris Piles", value=True)
-    detect_rubble = st.checkbox("Rubble", value=True)
-    detect_tarps = st.checkbox("Blue Tarps", value=True)
-    detect_vehicles = st.checkbox("Damaged Vehicles", value=False)
+    st.multiselect(
+        "Detection Categories", list(CATEGORY_PROMPTS),
+        default=["Debris Piles", "Rubble", "Blue Tarps"], key="detect_categories"
+    )
+
+    st.session_state.detect_cfg = {
+        "sensitivity": st.session_state.sensitivity,
+        "tile_mode": st.session_state.tile_mode,
+        "prompts": build_prompts(st.session_state.detect_categories),
+    }
 
     st.markdown("---")
     st.markdown("### Data Sources")
     st.markdown("[NOAA Milton](https://storms.ngs.noaa.gov/storms/milton/index.html)")
     st.markdown("[NOAA Helene](https://storms.ngs.noaa.gov/storms/helene/index.html)")
 
+
+with st.sidebar:
+    render_settings()
+
+cfg = st.session_state.detect_cfg
+sensitivity = cfg["sensitivity"]
+tile_mode = cfg["tile_mode"]
+
 # Main content
 col1, col2 = st.columns(2)
 
@@ -202,20 +560,24 @@ with col1:
     )
 
     if uploaded_file:
-        output_dir = Path("./output")
-        output_dir.mkdir(exist_ok=True)
-
-        ext = uploaded_file.name.split('.')[-1]
-        temp_path = output_dir / f"uploaded.{ext}"
-
-        with open(temp_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-
-        st.session_state.uploaded_image = str(temp_path)
-
-        image = Image.open(uploaded_file)
-        st.image(image, caption=f"Uploaded: {uploaded_file.name}", use_container_width=True)
-        st.success(f"✅ Ready! Size: {image.size[0]}x{image.size[1]}px")
+        upload_hash, sam_path, preview, full_size, scale = prepare_upload(uploaded_file, tile_mode)
+        if not (os.path.exists(sam_path) and os.path.exists(preview)):
+            # Evicted by prune_outputs(); write it again under the same
+            # name, so the cached entry (shared by every session) stays
+            # valid and nothing has to be cleared
+            build_upload(uploaded_file, tile_mode)
+
+        st.session_state.upload_hash = upload_hash
+        # Multiply detection coordinates by 1 / sam_scale to map them back
+        # onto the full-resolution upload
+        st.session_state.sam_scale = scale
+        st.session_state.uploaded_image = sam_path
+        st.session_state.uploaded_preview = preview
+        if not tile_mode:
+            preencode_upload(sam_path)
+
+        st.image(st.session_state.uploaded_preview, caption=f"Uploaded: {uploaded_file.name}", use_container_width=True)
+        st.success(f"✅ Ready! Size: {full_size[0]}x{full_size[1]}px")
     else:
         st.markdown("""
         <div class="info">
@@ -248,9 +610,7 @@ with col2:
         progress.progress(20)
 
         try:
-            os.environ['PYTORCH_ENABLE_MPS_FALLBACK'] = '1'
-            from samgeo.text_sam import LangSAM
-            sam = LangSAM()
+            sam = get_sam()
             progress.progress(40)
             status.info("✅ Model loaded!")
         except Exception as e:
@@ -259,92 +619,44 @@ with col2:
 
         status.info("🔍 Scanning for debris...")
 
-        results = {}
-        # Better prompts for hurricane debris detection
-        prompts = []
-        if detect_debris:
-            prompts.extend([
-                ("pile of garbage on street", "Street Debris"),
-                ("heap of broken wood and materials", "Material Piles"),
-                ("scattered debris near houses", "Yard Debris"),
-            ])
-        if detect_rubble:
-            prompts.extend([
-                ("broken concrete and bricks", "Rubble"),
-                ("demolished building materials", "Construction"),
-            ])
-        if detect_tarps:
-            prompts.extend([
-                ("blue tarp on roof", "Blue Tarps"),
-                ("blue plastic sheet covering damage", "Tarped Roofs"),
-            ])
-        if detect_vehicles:
-            prompts.append(("overturned car", "Vehicles"))
-
-        for i, (prompt, name) in enumerate(prompts):
-            status.info(f"🔍 Detecting: {name}...")
+        prompts = cfg["prompts"]
+
+        categories = tuple(name for _, name in prompts)
+        counts = np.zeros(len(categories), dtype=np.int32)
+        st.session_state.final_result = None
+        st.session_state.render_error = None
+        if prompts:
+            status.info(f"🔍 Detecting: {', '.join(categories)}...")
             try:
-                sam.predict(
-                    image=st.session_state.uploaded_image,
-                    text_prompt=prompt,
-                    box_threshold=sensitivity,
-                    text_threshold=sensitivity,
+                counts, st.session_state.final_result, st.session_state.render_error = run_detection(
+                    sam, st.session_state.upload_hash, st.session_state.uploaded_image,
+                    sensitivity, prompts, tile_mode
                 )
-                count = len(sam.boxes) if hasattr(sam, 'boxes') and sam.boxes is not None else 0
-                results[name] = count
-            except:
-                results[name] = 0
-
-            progress.progress(40 + int((i+1) / len(prompts) * 50))
-
-        # Save result
-        try:
-            result_path = Path("./output") / "result.png"
-            sam.show_anns(
-                cmap="Reds",
-                add_boxes=True,
-                alpha=0.5,
-                title="Detection Results",
-                output=str(result_path)
-            )
-            st.session_state.final_result = str(result_path)
-        except:
-            pass
+            except Exception as e:
+                st.warning(f"Detection failed: {e}")
 
         progress.progress(100)
         status.success("✅ Detection complete!")
 
-        st.session_state.results = results
+        st.session_state.results_view = build_results_view(categories, counts) if categories else None
         st.session_state.detection_complete = True
-        time.sleep(0.5)
-        st.rerun()
+        # The results panel is drawn below this block, so it picks up the
+        # new results in this same run; no st.rerun() needed.
 
 # Results
-if st.session_state.detection_complete and st.session_state.results:
+@st.fragment
+def render_results():
+    """Results panel; as a fragment, its download buttons rerun only this block."""
     st.markdown("---")
     st.markdown('<div class="section">📊 Step 3: Results</div>', unsafe_allow_html=True)
 
-    total = sum(st.session_state.results.values())
+    view = st.session_state.results_view
+    total = view["total"]
 
     # Metrics
-    cols = st.columns(4)
-    with cols[0]:
-        st.markdown(f"""
-        <div class="metric">
-            <div class="metric-value">{total}</div>
-            <div class="metric-label">Total Found</div>
-        </div>
-        """, unsafe_allow_html=True)
-
-    items = list(st.session_state.results.items())[:3]
-    for i, (name, count) in enumerate(items):
-        with cols[i+1]:
-            st.markdown(f"""
-            <div class="metric">
-                <div class="metric-value">{count}</div>
-                <div class="metric-label">{name}</div>
-            </div>
-            """, unsafe_allow_html=True)
+    for col, html in zip(st.columns(4), view["metrics_html"]):
+        with col:
+            st.markdown(html, unsafe_allow_html=True)
 
     # Images
     st.markdown("<br>", unsafe_allow_html=True)
@@ -352,13 +664,15 @@ if st.session_state.detection_complete and st.session_state.results:
 
     with img1:
         st.markdown("**Original Image**")
-        if st.session_state.uploaded_image and os.path.exists(st.session_state.uploaded_image):
-            st.image(st.session_state.uploaded_image, use_container_width=True)
+        if st.session_state.uploaded_preview is not None:
+            st.image(st.session_state.uploaded_preview, use_container_width=True)
 
     with img2:
         st.markdown("**Detection Results**")
-        if 'final_result' in st.session_state and os.path.exists(st.session_state.final_result):
+        if st.session_state.final_result is not None:
             st.image(st.session_state.final_result, use_container_width=True)
+        elif st.session_state.render_error:
+            st.warning(st.session_state.render_error)
 
     if total > 0:
         st.markdown(f"""
@@ -381,18 +695,18 @@ if st.session_state.detection_complete and st.session_state.results:
     exp1, exp2, exp3 = st.columns(3)
 
     with exp1:
-        import pandas as pd
-        df = pd.DataFrame([{"Category": k, "Count": v} for k, v in st.session_state.results.items()])
-        st.download_button("📄 CSV Report", df.to_csv(index=False), "results.csv", "text/csv", use_container_width=True)
+        st.download_button("📄 CSV Report", view["csv"], "results.csv", "text/csv", use_container_width=True)
 
     with exp2:
-        if 'final_result' in st.session_state and os.path.exists(st.session_state.final_result):
-            with open(st.session_state.final_result, "rb") as f:
-                st.download_button("🖼️ Result Image", f, "detection.png", "image/png", use_container_width=True)
+        if st.session_state.final_result is not None:
+            st.download_button("🖼️ Result Image", st.session_state.final_result, "detection.jpg", "image/jpeg", use_container_width=True)
 
     with exp3:
         st.button("🗺️ GeoJSON (Soon)", disabled=True, use_container_width=True)
 
+if st.session_state.detection_complete and st.session_state.results_view is not None:
+    render_results()
+
 # Footer
 st.markdown("---")
 st.markdown("""
@@ -6,20 +6,297 @@ from post-hurricane satellite imagery to help Red Cross target relief efforts.
 Hurricane Milton (Oct 2024) and Helene imagery from NOAA/Maxar
 """
 
+import hashlib
 import os
+from functools import lru_cache
 from pathlib import Path
 
-# Check for GPU availability
-try:
-    import torch
-    GPU_AVAILABLE = torch.cuda.is_available()
-    if GPU_AVAILABLE:
-        print(f"GPU detected: {torch.cuda.get_device_name(0)}")
+_gpu_available = None
+
+
+def gpu_available():
+    """
+    Check for GPU availability on first use.
+
+    Deferred so that importing this module (e.g. just to download imagery)
+    doesn't pay for importing torch.
+    """
+    global _gpu_available
+    if _gpu_available is None:
+        try:
+            import torch
+            _gpu_available = torch.cuda.is_available()
+            if _gpu_available:
+                print(f"GPU detected: {torch.cuda.get_device_name(0)}")
+            else:
+                print("No GPU detected - will use CPU (slower processing)")
+        except ImportError:
+            _gpu_available = False
+            print("PyTorch not installed yet")
+    return _gpu_available
+
+
+@lru_cache(maxsize=None)
+def load_model(use_text_prompts=True, precision="fp16", compile_model=False,
+               feature_cache_dir=None):
+    """
+    Load a segmentation model once per process.
+
+    Every DebrisDetector (and every re-run notebook cell that creates one)
+    shares the same weights instead of reloading several GB from disk.
+
+    Args:
+        use_text_prompts: If True, load LangSAM for text-based detection,
+            otherwise SamGeo for automatic segmentation
+        precision: "fp16", "bf16" or "fp32" autocast for LangSAM (see
+            FastLangSAM)
+        compile_model: torch.compile the LangSAM encoder and decoder on
+            CUDA. Compiling takes about a minute up front, so it only pays
+            off when one process runs many detections.
+        feature_cache_dir: Directory to persist LangSAM image embeddings
+            in, so later processes skip the encoder on images seen before
+    """
+    device = "cuda" if gpu_available() else "cpu"
+    if use_text_prompts:
+        # FastLangSAM caches the SAM image embedding, so running several
+        # prompts on one image pays for the ViT encoder only once
+        from fast_langsam import FastLangSAM
+        model = FastLangSAM(precision=precision, feature_cache_dir=feature_cache_dir)
+        if compile_model:
+            model.compile_encoder()
+            model.compile_decoder()
+        print("LangSAM initialized for text-prompt based detection")
     else:
-        print("No GPU detected - will use CPU (slower processing)")
-except ImportError:
-    GPU_AVAILABLE = False
-    print("PyTorch not installed yet")
+        from samgeo import SamGeo
+        model = SamGeo(
+            model_type="vit_h",  # Highest accuracy model
+            automatic=True,
+            device=device
+        )
+        print("SamGeo initialized for automatic segmentation")
+    return model
+
+
+# Where load_script_model() persists LangSAM image embeddings
+EMBEDDING_CACHE_DIR = Path("~/.cache/samgeo_embed").expanduser()
+
+
+def load_script_model():
+    """
+    Load LangSAM for the test scripts, configured like the app.
+
+    USE_BF16=1 selects bf16 autocast (fp16 otherwise) and USE_COMPILE=1
+    torch.compiles the encoder and decoder on CUDA. Image embeddings are
+    kept under EMBEDDING_CACHE_DIR, so re-running the scripts on the same
+    imagery skips the encoder.
+    """
+    return load_model(
+        precision="bf16" if os.environ.get("USE_BF16") == "1" else "fp16",
+        compile_model=os.environ.get("USE_COMPILE") == "1",
+        feature_cache_dir=EMBEDDING_CACHE_DIR,
+    )
+
+
+# Half the width of the Web Mercator (EPSG:3857) world, in meters
+_MERCATOR_HALF_WORLD = 20037508.342789244
+
+
+def _download_tiles_geotiff(tile_url, bbox, zoom, output, max_workers=16):
+    """
+    Download XYZ tiles covering a bbox concurrently and save a GeoTIFF.
+
+    Tile downloads are latency-bound, so they are fetched on a thread pool
+    instead of one at a time; max_workers caps the concurrent requests to
+    stay polite to the tile server. The mosaic is cropped to the bbox and
+    written in EPSG:3857.
+
+    Args:
+        tile_url: URL template with {z}, {x} and {y} placeholders
+        bbox: [west, south, east, north] in WGS84
+        zoom: Tile zoom level
+        output: Path of the GeoTIFF to write
+        max_workers: Maximum number of simultaneous tile requests
+
+    Returns:
+        True if every tile was downloaded. Missing tiles are left black,
+        so callers must not cache an incomplete mosaic.
+    """
+    import io
+    import math
+    import urllib.request
+    from concurrent.futures import ThreadPoolExecutor
+
+    import numpy as np
+    import rasterio
+    from PIL import Image
+    from rasterio.transform import from_origin
+
+    tile_size = 256
+    n = 2 ** zoom
+
+    def to_pixel(lon, lat):
+        x = (lon + 180.0) / 360.0 * n * tile_size
+        y = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n * tile_size
+        return x, y
+
+    west, south, east, north = bbox
+    left, top = to_pixel(west, north)
+    right, bottom = to_pixel(east, south)
+    left, top = int(math.floor(left)), int(math.floor(top))
+    right, bottom = int(math.ceil(right)), int(math.ceil(bottom))
+
+    tx0, ty0 = left // tile_size, top // tile_size
+    tx1, ty1 = (right - 1) // tile_size, (bottom - 1) // tile_size
+    # Every slot is written exactly once (tile pixels, or zeros for a
+    # missing tile), so the mosaic needn't be zero-filled up front
+    mosaic = np.empty(((ty1 - ty0 + 1) * tile_size, (tx1 - tx0 + 1) * tile_size, 3), dtype=np.uint8)
+
+    def fetch(tx, ty):
+        url = tile_url.format(z=zoom, x=tx, y=ty)
+        request = urllib.request.Request(url, headers={"User-Agent": "debris-detector"})
+        row, col = (ty - ty0) * tile_size, (tx - tx0) * tile_size
+        slot = mosaic[row:row + tile_size, col:col + tile_size]
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                tile = Image.open(io.BytesIO(response.read()))
+                # convert() always copies; JPEG tiles are already RGB
+                if tile.mode != "RGB":
+                    tile = tile.convert("RGB")
+                slot[...] = np.asarray(tile)[:tile_size, :tile_size]
+        except Exception:
+            slot[...] = 0
+            return False
+        return True
+
+    tiles = [(tx, ty) for ty in range(ty0, ty1 + 1) for tx in range(tx0, tx1 + 1)]
+    print(f"Downloading {len(tiles)} tiles at zoom {zoom}...")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        fetched = sum(executor.map(lambda t: fetch(*t), tiles))
+    if not fetched:
+        raise RuntimeError(f"No tiles could be downloaded from {tile_url}")
+    if fetched < len(tiles):
+        print(f"Warning: {len(tiles) - fetched} of {len(tiles)} tiles are missing")
+
+    x0, y0 = left - tx0 * tile_size, top - ty0 * tile_size
+    image = mosaic[y0:y0 + bottom - top, x0:x0 + right - left]
+
+    resolution = 2 * _MERCATOR_HALF_WORLD / (n * tile_size)
+    transform = from_origin(
+        -_MERCATOR_HALF_WORLD + left * resolution,
+        _MERCATOR_HALF_WORLD - top * resolution,
+        resolution, resolution,
+    )
+    with rasterio.open(
+        output, "w", driver="GTiff", width=image.shape[1], height=image.shape[0],
+        count=3, dtype="uint8", crs="EPSG:3857", transform=transform,
+        tiled=True, compress="deflate",
+    ) as dst:
+        dst.write(image.transpose(2, 0, 1))
+    return fetched == len(tiles)
+
+
+# XYZ basemaps accepted by download_tms_geotiff, named as in samgeo
+TILE_SOURCES = {
+    "Satellite": "https://mt1.google.com/vt/lyrs=s&x={x}&y={y}&z={z}",
+    "esri": "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}",
+}
+
+
+def download_tms_geotiff(output, bbox, zoom=18, source="Satellite", max_workers=32):
+    """
+    Drop-in replacement for samgeo's tms_to_geotiff that fetches tiles concurrently.
+
+    samgeo downloads tiles one after another, which dominates wall time at
+    zoom 18 (a 1 km box is ~100 tiles).
+
+    Args:
+        output: Path of the GeoTIFF to write
+        bbox: [west, south, east, north] in WGS84
+        zoom: Tile zoom level
+        source: Key of TILE_SOURCES or a URL template with {z}, {x} and {y}
+        max_workers: Maximum number of simultaneous tile requests
+
+    Returns:
+        Path to the GeoTIFF
+    """
+    _download_tiles_geotiff(
+        TILE_SOURCES.get(source, source), bbox=bbox, zoom=zoom,
+        output=str(output), max_workers=max_workers,
+    )
+    return Path(output)
+
+
+def mask_to_vector(mask, image_path, output_path):
+    """
+    Polygonize an in-memory mask with GDAL and write it as vector data.
+
+    Saves writing the mask to a GeoTIFF and reading it back just to
+    vectorize it, as samgeo's raster_to_vector requires.
+
+    GeoJSON output is meant for web maps, so it is simplified to half a
+    pixel and written with 5 decimal places (about 1 m in degrees),
+    which drops most of the staircase vertices of a pixel mask. A
+    full-precision GeoPackage is written next to it for analysis.
+
+    Args:
+        mask: 2D array, nonzero where something was detected. LangSAM's
+            prediction is int64, which GDAL can't polygonize, so it is
+            cast to uint8 here.
+        image_path: Raster the mask was predicted on (for georeferencing)
+        output_path: Vector file to write; format from its extension
+
+    Returns:
+        GeoDataFrame of the polygons, as written to output_path
+    """
+    import geopandas as gpd
+    import numpy as np
+    import rasterio
+    from rasterio.features import shapes
+    from shapely.geometry import shape
+
+    with rasterio.open(image_path) as src:
+        transform, crs = src.transform, src.crs
+
+    mask = np.asarray(mask).astype(np.uint8, copy=False)
+    polygons = shapes(mask, mask=mask > 0, transform=transform)
+    records = [{"geometry": shape(geom), "value": value} for geom, value in polygons]
+    gdf = gpd.GeoDataFrame(records, columns=["geometry", "value"], geometry="geometry", crs=crs)
+
+    output_path = Path(output_path)
+    if output_path.suffix.lower() not in (".geojson", ".json"):
+        gdf.to_file(str(output_path))
+        return gdf
+
+    gdf.to_file(str(output_path.with_suffix(".gpkg")), driver="GPKG")
+    gdf["geometry"] = gdf.geometry.simplify(abs(transform.a) / 2, preserve_topology=True)
+    gdf.to_file(str(output_path), driver="GeoJSON", COORDINATE_PRECISION=5)
+    return gdf
+
+
+def _write_mask(mask, output, source):
+    """
+    Write a uint8 mask as a tiled, deflate-compressed GeoTIFF.
+
+    Masks are almost all zeros, so deflate with horizontal differencing
+    (predictor=2) shrinks them by well over an order of magnitude, and
+    512x512 tiles keep windowed reads of them cheap.
+
+    Args:
+        mask: 2D array, same shape as the source image
+        output: Path of the GeoTIFF to write
+        source: Image the mask was predicted on; its transform and CRS
+            are copied
+    """
+    import rasterio
+
+    with rasterio.open(source) as src:
+        transform, crs = src.transform, src.crs
+    with rasterio.open(
+        output, "w", driver="GTiff", width=mask.shape[1], height=mask.shape[0],
+        count=1, dtype="uint8", crs=crs, transform=transform, tiled=True,
+        blockxsize=512, blockysize=512, compress="deflate", predictor=2, zlevel=6,
+    ) as dst:
+        dst.write(mask.astype("uint8", copy=False), 1)
 
 
 class DebrisDetector:
@@ -28,8 +305,9 @@ class DebrisDetector:
     Designed for post-hurricane damage assessment in Pinellas County, FL.
     """
 
-    def __init__(self, output_dir="./output"):
+    def __init__(self, output_dir="./output", precision="fp16"):
         self.output_dir = Path(output_dir)
+        self.precision = precision
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.sam = None
         self.lang_sam = None
@@ -42,21 +320,13 @@ class DebrisDetector:
             use_text_prompts: If True, use LangSAM for text-based detection
         """
         if use_text_prompts:
-            from samgeo.text_sam import LangSAM
-            self.lang_sam = LangSAM()
-            print("LangSAM initialized for text-prompt based detection")
+            self.lang_sam = load_model(use_text_prompts=True, precision=self.precision)
         else:
-            from samgeo import SamGeo
-            self.sam = SamGeo(
-                model_type="vit_h",  # Highest accuracy model
-                automatic=True,
-                device="cuda" if GPU_AVAILABLE else "cpu"
-            )
-            print("SamGeo initialized for automatic segmentation")
+            self.sam = load_model(use_text_prompts=False)
 
     def detect_debris_with_text(self, image_path, output_path=None,
                                  text_prompts=None, box_threshold=0.24,
-                                 text_threshold=0.24):
+                                 text_threshold=0.24, tile=False):
         """
         Detect debris piles using text prompts.
 
@@ -66,6 +336,9 @@ class DebrisDetector:
             text_prompts: List of text descriptions to search for
             box_threshold: Confidence threshold for bounding boxes
             text_threshold: Confidence threshold for text matching
+            tile: If True, run detection over overlapping 1024px tiles at
+                native resolution, so small piles in large scenes aren't lost
+                to SAM's downscale
 
         Returns:
             Path to output vector file with detected debris locations
@@ -92,37 +365,117 @@ class DebrisDetector:
         print(f"Detecting debris in: {image_path}")
         print(f"Using text prompts: {text_prompts}")
 
-        # Run detection for each prompt and combine results
-        all_masks = []
-        for prompt in text_prompts:
-            print(f"  Searching for: '{prompt}'...")
-            try:
-                self.lang_sam.predict(
-                    image=str(image_path),
-                    text_prompt=prompt,
-                    box_threshold=box_threshold,
-                    text_threshold=text_threshold,
-                )
-                # Save intermediate results
-                prompt_output = self.output_dir / f"debris_{prompt.replace(' ', '_')}.tif"
-                self.lang_sam.save_masks(
-                    output=str(prompt_output),
-                    dtype="uint8"
-                )
-                all_masks.append(prompt_output)
-            except Exception as e:
-                print(f"  Warning: No matches for '{prompt}': {e}")
-
-        # Convert to vector format for GIS use
-        if all_masks:
-            self.lang_sam.raster_to_vector(
-                str(all_masks[-1]),  # Use last successful mask
-                str(output_path)
+        from concurrent.futures import ThreadPoolExecutor
+        import numpy as np
+        from fast_langsam import combined_caption, has_detections, match_phrases
+
+        # GroundingDINO takes every prompt in one " . "-separated caption, so
+        # the text and image encoders run once for the whole prompt set;
+        # each box's phrase is then mapped back to the prompt it came from
+        predict = self.lang_sam.predict_tiles if tile else self.lang_sam.predict
+        try:
+            result = predict(
+                image=str(image_path),
+                text_prompt=combined_caption(text_prompts),
+                box_threshold=box_threshold,
+                text_threshold=text_threshold,
+                return_results=True,
             )
+        except Exception as e:
+            print(f"  Warning: Detection failed: {e}")
+            return output_path
+        if not has_detections(result):
+            print("  Warning: No matches for any prompt")
+            return output_path
+
+        masks, _, phrases, _ = result
+        labels = np.asarray(match_phrases(phrases, text_prompts))
+        for i, prompt in enumerate(text_prompts):
+            print(f"  '{prompt}': {int((labels == i).sum())} matches")
+
+        # Save intermediate results: one mask per prompt (tiled runs only
+        # keep the merged mask) plus the union of all detections
+        outputs = []
+        if masks is not None:
+            masks = masks.cpu().numpy().astype(bool)
+            for i, prompt in enumerate(text_prompts):
+                if (labels == i).any():
+                    prompt_mask = masks[labels == i].any(axis=0).astype(np.uint8) * 255
+                    outputs.append((self.output_dir / f"debris_{prompt.replace(' ', '_')}.tif", prompt_mask))
+        all_output = self.output_dir / "debris_all_prompts.tif"
+        outputs.append((all_output, self.lang_sam.prediction))
+
+        with ThreadPoolExecutor() as writer:
+            futures = [
+                writer.submit(_write_mask, array, str(path), str(image_path))
+                for path, array in outputs
+            ]
+            saved = []
+            for (path, _), future in zip(outputs, futures):
+                try:
+                    future.result()
+                    saved.append(path)
+                except Exception as e:
+                    print(f"  Warning: Could not save {path.name}: {e}")
+
+        # Convert to vector format for GIS use. The union mask is still in
+        # memory, so polygonize it directly instead of re-reading the GeoTIFF
+        if all_output in saved:
+            mask_to_vector(self.lang_sam.prediction, image_path, output_path)
             print(f"Results saved to: {output_path}")
 
         return output_path
 
+    def _ensure_tiled(self, path):
+        """
+        Return a tiled GeoTIFF copy of a striped raster, with overviews.
+
+        Windowed reads of a striped TIFF have to decode every full-width
+        scanline the window touches; 512x512 blocks limit each read to the
+        blocks it overlaps. Copies are named by the source's path, mtime and
+        size, so each input is converted once. Tiled inputs and non-TIFFs are
+        returned unchanged.
+
+        Args:
+            path: Path to the input raster
+
+        Returns:
+            Path to a tiled raster with the same pixels and georeferencing
+        """
+        import rasterio
+        from rasterio.enums import Resampling
+
+        path = Path(path)
+        if path.suffix.lower() not in (".tif", ".tiff"):
+            return path
+        with rasterio.open(path) as src:
+            if src.profile.get("tiled"):
+                return path
+            profile = src.profile.copy()
+
+            stat = path.stat()
+            key = hashlib.blake2b(
+                repr((str(path.resolve()), stat.st_mtime_ns, stat.st_size)).encode(),
+                digest_size=8,
+            ).hexdigest()
+            tiled_path = self.output_dir / f"{path.stem}_{key}_tiled.tif"
+            if tiled_path.exists():
+                return tiled_path
+
+            print(f"Rewriting {path.name} as a tiled GeoTIFF...")
+            profile.update(driver="GTiff", tiled=True, blockxsize=512,
+                           blockysize=512, compress="deflate")
+            # YCbCr photometric is only valid with JPEG compression
+            profile.pop("photometric", None)
+            profile.pop("jpeg_quality", None)
+            part = tiled_path.with_suffix(".part.tif")
+            with rasterio.open(part, "w", **profile) as dst:
+                for _, window in dst.block_windows(1):
+                    dst.write(src.read(window=window), window=window)
+                dst.build_overviews([2, 4, 8, 16], Resampling.average)
+        os.replace(part, tiled_path)
+        return tiled_path
+
     def detect_debris_automatic(self, image_path, output_path=None):
         """
         Automatic segmentation - detects all objects, then filter for debris.
@@ -143,6 +496,9 @@ class DebrisDetector:
 
         mask_path = self.output_dir / "masks.tif"
 
+        # Batch mode reads the image window by window
+        image_path = self._ensure_tiled(image_path)
+
         print(f"Running automatic segmentation on: {image_path}")
 
         # Generate all masks
@@ -155,11 +511,12 @@ class DebrisDetector:
             mask_multiplier=255
         )
 
-        # Convert to vector
-        self.sam.raster_to_vector(
-            str(mask_path),
-            str(output_path)
-        )
+        # Convert to vector in-process with the same polygonizing as the
+        # text-prompt path
+        import rasterio
+        with rasterio.open(mask_path) as src:
+            mask = src.read(1)
+        mask_to_vector(mask, mask_path, output_path)
 
         print(f"Segmentation complete. Results: {output_path}")
         return output_path
@@ -170,17 +527,13 @@ class DebrisDetector:
 
         Args:
             bbox: Bounding box [west, south, east, north] in WGS84
-            output_path: Where to save the imagery
+            output_path: Where to save the imagery. By default a path keyed
+                on the bbox and source, so repeat requests reuse the file.
             source: "milton" or "helene"
 
         Returns:
             Path to downloaded imagery
         """
-        from samgeo import tms_to_geotiff
-
-        if output_path is None:
-            output_path = self.output_dir / f"noaa_{source}_imagery.tif"
-
         # NOAA imagery tile services
         # Note: These are example URLs - actual NOAA tiles may require
         # accessing through their official portals
@@ -190,56 +543,86 @@ class DebrisDetector:
             # Fallback to standard satellite imagery
             "esri": "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}"
         }
-
-        tms_url = tms_sources.get(source, tms_sources["esri"])
+        zoom = 18  # High resolution for debris detection
+
+        def cached_path(name):
+            # Keyed on the request, so the same area is only fetched once.
+            # Only complete mosaics are stored under this name, so a hit
+            # needs no further check; "complete" in the key retires files
+            # cached before that rule, which may have missing tiles
+            key = hashlib.blake2b(
+                repr((tuple(bbox), zoom, name, "complete")).encode(), digest_size=8
+            ).hexdigest()
+            return self.output_dir / f"noaa_{name}_{key}.tif"
+
+        def fetch(name, path):
+            path = Path(path)
+            if output_path is None and path.exists():
+                print(f"Using cached imagery: {path}")
+                return path
+            # Download under a temporary name so an interrupted fetch
+            # is never mistaken for a cached one
+            part = path.with_suffix(".part.tif")
+            complete = _download_tiles_geotiff(
+                tms_sources.get(name, tms_sources["esri"]),
+                bbox=bbox,
+                zoom=zoom,
+                output=str(part),
+            )
+            if not complete and output_path is None:
+                # Keep the gappy mosaic out of the cache, so the next
+                # request downloads the area again
+                incomplete = path.with_suffix(".incomplete.tif")
+                os.replace(part, incomplete)
+                print(f"Imagery is incomplete; not caching it: {incomplete}")
+                return incomplete
+            os.replace(part, path)
+            return path
+
+        if source not in tms_sources:
+            source = "esri"
 
         print(f"Downloading {source} imagery for bbox: {bbox}")
 
         try:
-            tms_to_geotiff(
-                output=str(output_path),
-                bbox=bbox,
-                zoom=18,  # High resolution for debris detection
-                source=tms_url,
-                quiet=False
-            )
-            print(f"Imagery saved to: {output_path}")
-            return output_path
+            path = fetch(source, output_path or cached_path(source))
+            print(f"Imagery saved to: {path}")
+            return path
         except Exception as e:
             print(f"Error downloading imagery: {e}")
             print("Try using ESRI World Imagery as fallback...")
-            tms_to_geotiff(
-                output=str(output_path),
-                bbox=bbox,
-                zoom=18,
-                source=tms_sources["esri"],
-                quiet=False
-            )
-            return output_path
+            return fetch("esri", output_path or cached_path("esri"))
 
-    def create_interactive_map(self, geojson_path, center=None):
+    def create_interactive_map(self, geojson_path, center=None, max_polygons=2000):
         """
         Create an interactive map showing detected debris piles.
 
         Args:
             geojson_path: Path to debris detection results
             center: Map center [lat, lon], defaults to Pinellas County
+            max_polygons: Above this many detections the map shows
+                clustered centroid markers instead of every polygon, since
+                Leaflet renders all GeoJSON vertices at every zoom level
 
         Returns:
             Folium map object
         """
         import folium
         import geopandas as gpd
+        from folium.plugins import FastMarkerCluster
 
         # Default to Pinellas County, FL
         if center is None:
             center = [27.9, -82.7]  # Pinellas County approximate center
 
-        # Create base map
+        # Create base map. prefer_canvas draws vector layers on one canvas
+        # instead of an SVG element per polygon, which keeps large result
+        # sets responsive in the browser.
         m = folium.Map(
             location=center,
             zoom_start=14,
-            tiles="OpenStreetMap"
+            tiles="OpenStreetMap",
+            prefer_canvas=True
         )
 
         # Add satellite imagery layer
@@ -253,26 +636,39 @@ class DebrisDetector:
         # Load and add debris detection results
         if Path(geojson_path).exists():
             gdf = gpd.read_file(geojson_path)
-
-            # Style for debris polygons
-            style_function = lambda x: {
-                'fillColor': '#ff0000',
-                'color': '#ff0000',
-                'weight': 2,
-                'fillOpacity': 0.5
-            }
-
-            folium.GeoJson(
-                gdf,
-                name="Detected Debris Piles",
-                style_function=style_function,
-                tooltip=folium.GeoJsonTooltip(
-                    fields=['id'] if 'id' in gdf.columns else [],
-                    aliases=['Debris ID:']
-                )
-            ).add_to(m)
-
-            print(f"Added {len(gdf)} debris polygons to map")
+            if gdf.crs is not None and not gdf.crs.is_geographic:
+                gdf = gdf.to_crs(epsg=4326)
+
+            if len(gdf) > max_polygons:
+                # Markers are clustered in the browser, so only the
+                # clusters in view are drawn however many detections
+                # there are
+                centroids = gdf.geometry.representative_point()
+                FastMarkerCluster(
+                    list(zip(centroids.y, centroids.x)),
+                    name="Detected Debris Piles",
+                ).add_to(m)
+                print(f"Added {len(gdf)} debris locations to map as clustered markers")
+            else:
+                # Style for debris polygons
+                style_function = lambda x: {
+                    'fillColor': '#ff0000',
+                    'color': '#ff0000',
+                    'weight': 2,
+                    'fillOpacity': 0.5
+                }
+
+                folium.GeoJson(
+                    gdf,
+                    name="Detected Debris Piles",
+                    style_function=style_function,
+                    tooltip=folium.GeoJsonTooltip(
+                        fields=['id'] if 'id' in gdf.columns else [],
+                        aliases=['Debris ID:']
+                    )
+                ).add_to(m)
+
+                print(f"Added {len(gdf)} debris polygons to map")
 
         # Add layer control
         folium.LayerControl().add_to(m)
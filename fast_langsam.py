@@ -0,0 +1,488 @@
+"""
+Performance-tuned LangSAM for debris detection
+Extends samgeo's LangSAM with opt-in inference optimizations so the
+Streamlit app and the detection scripts share one model setup.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+
+import numpy as np
+import rasterio
+import torch
+from PIL import Image
+from samgeo.text_sam import LangSAM
+from torchvision.ops import nms
+from segment_anything import SamPredictor
+
+
+class CachedSamPredictor(SamPredictor):
+    """
+    SamPredictor that remembers image-encoder features per image.
+    The encoder output depends only on the pixels, so re-running detection
+    on the same image with new prompts or thresholds skips the ViT pass.
+    With cache_dir set, features are also saved to disk, so they survive
+    across processes (e.g. repeated runs of the test scripts).
+    """
+
+    def __init__(self, sam_model, cache_size=8, cache_dir=None):
+        super().__init__(sam_model)
+        self.cache_size = cache_size
+        self._feature_cache = OrderedDict()
+        self.cache_dir = Path(cache_dir).expanduser() if cache_dir else None
+        # Encoder settings that change its output (autocast precision,
+        # INT8 quantization, compilation); set by FastLangSAM and part of
+        # every cache key, so features from one variant never serve another
+        self.variant = {}
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # Fingerprint of the checkpoint, so features from other weights
+            # (ViT-B/L/H, or a fine-tune) are kept apart on disk
+            weights = next(sam_model.image_encoder.parameters()).detach().float().cpu().numpy()
+            self._model_id = hashlib.blake2b(weights.tobytes(), digest_size=8).hexdigest()
+
+    def set_image(self, image, image_format="RGB"):
+        image = np.ascontiguousarray(image)
+        key = (hashlib.blake2b(image.data, digest_size=16).hexdigest(),
+               image.shape, image_format, tuple(sorted(self.variant.items())))
+
+        cached = self._feature_cache.get(key)
+        if cached is None:
+            cached = self._load_features(key)
+            if cached is not None:
+                self._remember(key, cached)
+        if cached is not None:
+            self._feature_cache.move_to_end(key)
+            self.reset_image()
+            self.features, self.original_size, self.input_size = cached
+            self.is_image_set = True
+            return
+
+        super().set_image(image, image_format)
+        # Clone so a compiled encoder replaying a CUDA graph can't overwrite
+        # the cached tensor on its next run
+        cached = (self.features.clone(), self.original_size, self.input_size)
+        self._remember(key, cached)
+        self._save_features(key, cached)
+
+    def _remember(self, key, cached):
+        self._feature_cache[key] = cached
+        if len(self._feature_cache) > self.cache_size:
+            self._feature_cache.popitem(last=False)
+
+    def _feature_path(self, key):
+        name = hashlib.blake2b(repr((key, self._model_id)).encode(), digest_size=16).hexdigest()
+        return self.cache_dir / f"{name}.pt"
+
+    def _load_features(self, key):
+        """Features saved by an earlier process, or None."""
+        if self.cache_dir is None:
+            return None
+        try:
+            saved = torch.load(self._feature_path(key), map_location=self.device)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Ignoring unreadable cached image embedding: {e}")
+            return None
+        return saved["features"], tuple(saved["original_size"]), tuple(saved["input_size"])
+
+    def _save_features(self, key, cached):
+        if self.cache_dir is None:
+            return
+        features, original_size, input_size = cached
+        path = self._feature_path(key)
+        part = path.with_name(path.name + ".part")
+        # Stored as FP32 so the embedding works under any autocast setting
+        torch.save({"features": features.float().cpu(), "original_size": original_size,
+                    "input_size": input_size}, part)
+        os.replace(part, path)
+
+
+def has_detections(result):
+    """
+    Whether a predict(return_results=True) result found anything.
+
+    LangSAM.predict reports an empty detection as empty boxes, masks and
+    phrases rather than None; predict_tiles returns None instead.
+    """
+    return result is not None and len(result[1]) > 0
+
+
+def combined_caption(prompts):
+    """GroundingDINO caption covering every prompt: "a . b . c ."."""
+    return " . ".join(prompts) + " ."
+
+
+def match_phrases(phrases, prompts):
+    """
+    Map the phrases of a combined_caption() detection back to prompts.
+
+    GroundingDINO reports the prompt tokens that matched each box, so a
+    phrase is assigned to the prompt it shares the most words with. Ties
+    (including word pieces such as "tar" that match no whole word) go to
+    the prompt that contains the phrase as a substring.
+
+    Args:
+        phrases: Phrase per detected box
+        prompts: Prompt strings the caption was built from
+
+    Returns:
+        Index into prompts for each phrase
+    """
+    prompt_words = [set(prompt.split()) for prompt in prompts]
+
+    def score(phrase, i):
+        return len(set(phrase.split()) & prompt_words[i]), phrase in prompts[i]
+
+    return [max(range(len(prompts)), key=lambda i: score(phrase, i)) for phrase in phrases]
+
+
+def _tile_starts(length, tile_size, stride):
+    """Offsets of tiles covering [0, length), the last one flush with the edge."""
+    starts = list(range(0, max(length - tile_size, 0) + 1, stride))
+    if starts[-1] + tile_size < length:
+        starts.append(length - tile_size)
+    return starts
+
+
+class FastLangSAM(LangSAM):
+    """
+    LangSAM with optional inference optimizations.
+    Predictions always run without autograd bookkeeping; other
+    optimizations are enabled explicitly.
+    """
+
+    def __init__(self, *args, precision="fp16", feature_cache_size=8,
+                 feature_cache_dir=None, **kwargs):
+        """
+        Args:
+            precision: "fp16" to run CUDA forward passes under FP16 autocast,
+                "bf16" for BF16 autocast on CUDA or CPU, "fp32" to keep full
+                precision. FP16 is ignored on CPU.
+            feature_cache_size: Number of images whose encoder features
+                are kept in memory
+            feature_cache_dir: Directory to also persist encoder features
+                in, keyed by the image pixels; None keeps them in memory only
+            *args, **kwargs: Passed through to LangSAM
+        """
+        super().__init__(*args, **kwargs)
+        self.precision = self._supported_precision(precision)
+        # Serializes use of the model and of the results stored on it;
+        # hold it across predict() and reads of boxes/prediction
+        self.lock = threading.RLock()
+        self.sam = CachedSamPredictor(
+            self.sam.model, cache_size=feature_cache_size, cache_dir=feature_cache_dir
+        )
+        self.sam.variant["precision"] = self.precision
+
+    def _supported_precision(self, precision):
+        """
+        Fall back to FP32 where reduced precision would be slower.
+
+        FP16 autocast only pays off with tensor cores (compute capability
+        7.0+), and BF16 needs an Ampere or newer GPU.
+        """
+        if torch.device(self.device).type != "cuda" or precision == "fp32":
+            return precision
+        if precision == "fp16" and torch.cuda.get_device_capability()[0] < 7:
+            print("GPU has no FP16 tensor cores - running in FP32")
+            return "fp32"
+        if precision == "bf16" and not torch.cuda.is_bf16_supported():
+            print("GPU does not support BF16 - running in FP32")
+            return "fp32"
+        return precision
+
+    def inference_context(self):
+        """
+        Context manager for inference-only forward passes.
+
+        Uses torch.inference_mode() to skip autograd tracking and, with
+        precision="fp16" (CUDA) or "bf16" (CUDA or CPU), autocast so the ViT
+        encoder moves half the bytes. Weights stay FP32, so ops that need it
+        are not downcast.
+        """
+        stack = ExitStack()
+        stack.enter_context(torch.inference_mode())
+        device_type = torch.device(self.device).type
+        if self.precision == "fp16" and device_type == "cuda":
+            stack.enter_context(torch.autocast(device_type="cuda", dtype=torch.float16))
+        elif self.precision == "bf16" and device_type in ("cuda", "cpu"):
+            stack.enter_context(torch.autocast(device_type=device_type, dtype=torch.bfloat16))
+        return stack
+
+    def predict(self, *args, **kwargs):
+        """
+        Run LangSAM.predict inside inference_context().
+
+        Calls are serialized with a lock: the model stores its results on
+        self, and one instance is shared by every Streamlit session.
+        """
+        with self.lock:
+            return self._predict(*args, **kwargs)
+
+    def _predict(self, image, *args, **kwargs):
+        """LangSAM.predict inside inference_context(), without taking the lock."""
+        if isinstance(image, str) and not image.startswith("http"):
+            image = self.load_image(image)
+        with self.inference_context():
+            return super().predict(image, *args, **kwargs)
+
+    def load_image(self, path):
+        """
+        Read an image file the way LangSAM.predict does.
+
+        Decoded images are not cached: the model is shared process-wide,
+        and full-resolution rasters would stay pinned on it. Repeat
+        detections still skip the encoder through the feature cache. Like
+        predict(), this sets source, transform and crs for georeferenced
+        outputs.
+
+        Args:
+            path: Path to the image (GeoTIFF, PNG, JPEG, ...)
+
+        Returns:
+            RGB PIL image
+        """
+        with rasterio.open(path) as src:
+            # Read only the RGB bands, one at a time, into a contiguous
+            # pixel-interleaved buffer PIL can take without another
+            # copy; reading every band and transposing made PIL copy
+            # the strided array, tripling peak memory on large tiles
+            bands = [1, 2, 3] if src.count >= 3 else [1, 1, 1]
+            image_np = np.empty((src.height, src.width, 3), dtype=src.dtypes[0])
+            band = np.empty((src.height, src.width), dtype=src.dtypes[0])
+            for i, index in enumerate(bands):
+                src.read(index, out=band)
+                image_np[:, :, i] = band
+            del band
+            image = Image.fromarray(image_np)
+            self.transform, self.crs = src.transform, src.crs
+        self.source = path
+        return image
+
+    def encode_image(self, image):
+        """
+        Run the SAM image encoder ahead of predict() and cache the features.
+
+        Lets callers encode an image as soon as it is available (e.g. right
+        after upload) so the later predict() only runs the text and mask
+        decoder paths.
+
+        Args:
+            image: Path to the image or a PIL image
+        """
+        with self.lock:
+            if isinstance(image, str):
+                image = self.load_image(image)
+            with self.inference_context():
+                self.sam.set_image(np.asarray(image))
+
+    def predict_tiles(self, image, text_prompt, box_threshold, text_threshold,
+                      tile_size=1024, overlap=128, iou_threshold=0.5,
+                      return_results=False, workers=4):
+        """
+        Detect objects in a large image by running predict() on overlapping tiles.
+
+        Each tile is seen at native resolution, so small debris piles are not
+        lost to SAM's internal downscale, and encoder memory depends on the
+        tile size rather than the whole image. Boxes are shifted back to
+        full-image coordinates and de-duplicated across tile seams with NMS.
+
+        Args:
+            image: Path to the image or a PIL image
+            text_prompt: Text prompt passed to predict()
+            box_threshold: Confidence threshold for bounding boxes
+            text_threshold: Confidence threshold for text matching
+            tile_size: Tile width/height in pixels
+            overlap: Overlap between neighbouring tiles in pixels
+            iou_threshold: IoU above which overlapping boxes are merged
+            return_results: Return the merged detections
+            workers: Threads preparing and merging tiles around the
+                (serialized) model forward pass
+
+        Returns:
+            (masks, boxes, phrases, logits) like predict(return_results=True),
+            with masks set to None, if return_results is True and anything
+            was found; otherwise None. Results are also stored on self,
+            as empty boxes and a blank mask when nothing was found.
+        """
+        # Hold the model for this whole call, like predict() does. The
+        # image is loaded under the lock too: load_image() sets source,
+        # transform and crs on the shared model, which another call could
+        # otherwise overwrite before this one's mask is saved
+        with self.lock:
+            if isinstance(image, str):
+                # Reads GeoTIFFs like predict() and sets source/transform/crs,
+                # so the merged mask can be saved georeferenced
+                image = self.load_image(image)
+            width, height = image.size
+            stride = tile_size - overlap
+
+            overlay = np.zeros((height, width), dtype=np.uint8)
+            overlay_lock = threading.Lock()
+            # Workers can't take self.lock (the calling thread holds it), so
+            # the forward passes are serialized on a lock of their own
+            forward_lock = threading.Lock()
+
+            def run_tile(left, top):
+                right, bottom = min(left + tile_size, width), min(top + tile_size, height)
+                tile = image.crop((left, top, right, bottom))
+                # The model keeps per-call state on self, so only the forward
+                # pass is serialized; cropping and merging run in parallel
+                with forward_lock:
+                    result = self._predict(
+                        tile, text_prompt, box_threshold, text_threshold, return_results=True
+                    )
+                    found = has_detections(result)
+                    tile_mask = self.prediction > 0 if found else None
+                if not found:
+                    return None
+                _, tile_boxes, tile_phrases, tile_logits = result
+                with overlay_lock:
+                    overlay[top:bottom, left:right] |= tile_mask.astype(np.uint8)
+                offset = torch.tensor([left, top, left, top], dtype=torch.float32)
+                return tile_boxes.float() + offset, list(tile_phrases), tile_logits.float()
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(run_tile, left, top)
+                    for top in _tile_starts(height, tile_size, stride)
+                    for left in _tile_starts(width, tile_size, stride)
+                ]
+                tiles = [f.result() for f in futures]
+
+            boxes, phrases, logits = [], [], []
+            for tile in tiles:
+                if tile is not None:
+                    boxes.append(tile[0])
+                    phrases.extend(tile[1])
+                    logits.append(tile[2])
+
+            # Results are stored on self even when nothing was found, so the
+            # previous call's boxes and mask never outlive this one
+            self.image = image
+            self.masks = None
+            self.prediction = overlay * 255
+            if not boxes:
+                self.boxes, self.phrases, self.logits = torch.empty((0, 4)), [], torch.empty(0)
+                return None
+
+            boxes, logits = torch.cat(boxes), torch.cat(logits)
+            keep = nms(boxes, logits, iou_threshold)
+            self.boxes = boxes[keep]
+            self.phrases = [phrases[i] for i in keep.tolist()]
+            self.logits = logits[keep]
+            if return_results:
+                return None, self.boxes, self.phrases, self.logits
+
+    def compile_encoder(self):
+        """
+        Compile the SAM image encoder with torch.compile on CUDA.
+
+        SamPredictor always pads the encoder input to a fixed square, so
+        mode="reduce-overhead" can capture it as a CUDA graph and replay it
+        without per-kernel launch overhead. A warm-up pass runs here so the
+        compile cost is paid at load time instead of on the first request.
+
+        Returns:
+            True if the encoder was compiled
+        """
+        if torch.device(self.device).type != "cuda" or not hasattr(torch, "compile"):
+            print("torch.compile needs CUDA and PyTorch 2.x - keeping eager encoder")
+            return False
+
+        model = self.sam.model
+        model.image_encoder = torch.compile(
+            model.image_encoder, mode="reduce-overhead", fullgraph=False
+        )
+        self.sam.variant["compiled"] = True
+
+        size = model.image_encoder.img_size
+        with self.inference_context():
+            model.image_encoder(torch.zeros(1, 3, size, size, device=self.device))
+        print("SAM image encoder compiled")
+        return True
+
+    def compile_decoder(self):
+        """
+        Compile the SAM mask decoder with torch.compile on CUDA.
+
+        With encoder features cached, repeat detections on an image are
+        dominated by the decoder. Its batch is the number of detected boxes,
+        so it is compiled with dynamic shapes and without CUDA graphs, which
+        would be recaptured for every new box count. A warm-up pass with one
+        box runs here so the first request doesn't pay the compile cost.
+
+        Returns:
+            True if the decoder was compiled
+        """
+        if torch.device(self.device).type != "cuda" or not hasattr(torch, "compile"):
+            print("torch.compile needs CUDA and PyTorch 2.x - keeping eager decoder")
+            return False
+
+        model = self.sam.model
+        model.mask_decoder = torch.compile(model.mask_decoder, dynamic=True)
+
+        embed_dim = model.prompt_encoder.embed_dim
+        h, w = model.prompt_encoder.image_embedding_size
+        with self.inference_context():
+            sparse, dense = model.prompt_encoder(
+                points=None,
+                boxes=torch.zeros(1, 4, device=self.device),
+                masks=None,
+            )
+            model.mask_decoder(
+                image_embeddings=torch.zeros(1, embed_dim, h, w, device=self.device),
+                image_pe=model.prompt_encoder.get_dense_pe(),
+                sparse_prompt_embeddings=sparse,
+                dense_prompt_embeddings=dense,
+                multimask_output=False,
+            )
+        print("SAM mask decoder compiled")
+        return True
+
+    def warmup(self):
+        """
+        Prime CUDA before the first real request.
+
+        Enables cuDNN autotuning and runs one dummy encoder pass, so CUDA
+        context creation, kernel selection and caching-allocator growth
+        happen at load time. No-op on CPU.
+        """
+        if torch.device(self.device).type != "cuda":
+            return
+
+        torch.backends.cudnn.benchmark = True
+        torch.cuda.empty_cache()
+        size = self.sam.model.image_encoder.img_size
+        with self.inference_context():
+            self.sam.model.image_encoder(torch.zeros(1, 3, size, size, device=self.device))
+        torch.cuda.synchronize()
+
+    def quantize_int8(self):
+        """
+        Quantize the SAM image encoder's linear layers to INT8.
+
+        Uses PyTorch dynamic quantization (INT8 weights, activations
+        quantized on the fly), which is only supported on CPU.
+
+        Returns:
+            True if the encoder was quantized, False on GPU devices
+        """
+        if torch.device(self.device).type != "cpu":
+            print("INT8 quantization is CPU-only - keeping FP32 encoder")
+            return False
+
+        model = self.sam.model
+        model.image_encoder = torch.ao.quantization.quantize_dynamic(
+            model.image_encoder, {torch.nn.Linear}, dtype=torch.qint8
+        )
+        self.sam.variant["int8"] = True
+        print("SAM image encoder quantized to INT8")
+        return True
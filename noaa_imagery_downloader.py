@@ -8,11 +8,99 @@ License: Creative Commons Attribution Non-Commercial 4.0
 For Pinellas County debris detection to support Red Cross relief efforts.
 """
 
+import hashlib
+import json
 import os
-import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
 
+@lru_cache(maxsize=None)
+def s3_client():
+    """
+    Anonymous S3 client for the public Maxar bucket, created once.
+
+    boto3 clients are thread-safe and keep a connection pool, so every
+    download shares the same HTTPS connections instead of starting an
+    AWS CLI process per call. The pool is sized for the 8 download
+    threads times 8 byte-range parts each; keepalive stops idle pooled
+    connections from being dropped between tiles, and adaptive retries
+    back off when S3 throttles.
+    """
+    import boto3
+    from botocore import UNSIGNED
+    from botocore.config import Config
+
+    return boto3.client(
+        "s3",
+        config=Config(
+            signature_version=UNSIGNED,
+            max_pool_connections=64,
+            tcp_keepalive=True,
+            retries={"max_attempts": 10, "mode": "adaptive"},
+        )
+    )
+
+
+def split_s3_path(s3_path):
+    """Split "s3://bucket/key/prefix" into ("bucket", "key/prefix")."""
+    bucket, _, key = s3_path[len("s3://"):].partition("/")
+    return bucket, key
+
+
+# Pinellas County [west, south, east, north] in WGS84
+PINELLAS_BBOX = [-82.9, 27.6, -82.6, 28.1]
+
+
+def ard_zone_prefix(west, south, east, north):
+    """
+    Event subdirectory of the Maxar ARD tiles covering a bbox.
+
+    Maxar ARD tiles are laid out as ard/<UTM zone>/<quadkey>/<date>/, with
+    quadkeys on a per-zone grid rather than Web Mercator, so a bbox can be
+    narrowed down to its UTM zone. Listing that prefix pages through one
+    zone's tiles instead of the whole event.
+
+    Returns:
+        "ard/<zone>/", or "ard/" if the bbox spans more than one zone
+    """
+    zones = {int((lon + 180) // 6) + 1 for lon in (west, east)}
+    if len(zones) > 1:
+        return "ard/"
+    return f"ard/{zones.pop()}/"
+
+
+def _recompress_webp(src_path, dst_path):
+    """
+    Copy a GeoTIFF to a 512x512-tiled, lossless WebP-compressed GeoTIFF.
+
+    Lossless WebP keeps the pixels the detector sees unchanged while
+    typically beating deflate/LZW sources on size. It will not shrink
+    tiles that are already JPEG-compressed, hence opt-in. The copy runs
+    block by block, so full Maxar tiles never have to fit in memory.
+
+    Args:
+        src_path: GeoTIFF to read
+        dst_path: GeoTIFF to write
+    """
+    import rasterio
+
+    with rasterio.open(src_path) as src:
+        profile = src.profile
+        profile.update(
+            driver="GTiff", compress="WEBP", webp_lossless=True,
+            tiled=True, blockxsize=512, blockysize=512,
+        )
+        # WebP has no use for a source PHOTOMETRIC=YCbCr or a JPEG setting
+        profile.pop("photometric", None)
+        profile.pop("jpeg_quality", None)
+        with rasterio.open(dst_path, "w", **profile) as dst:
+            for _, window in dst.block_windows(1):
+                dst.write(src.read(window=window), window=window)
+
+
 class NOAAImageryDownloader:
     """
     Download NOAA/Maxar post-hurricane imagery from AWS S3.
@@ -34,42 +122,78 @@ class NOAAImageryDownloader:
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
-    def list_available_imagery(self, hurricane="milton"):
+    def list_available_imagery(self, hurricane="milton", max_age_hours=24, prefix=""):
         """
-        List available imagery files on S3 (requires AWS CLI).
+        List available imagery directories and files on S3.
+
+        Listings are cached under output_dir/.listing_cache, so repeat calls
+        within max_age_hours skip the paginated S3 round trips.
 
         Args:
             hurricane: "milton" or "helene"
+            max_age_hours: How long a cached listing stays valid
+            prefix: Subdirectory path within the event to list
         """
-        s3_path = self.S3_SOURCES.get(hurricane, self.S3_SOURCES["milton"])
+        s3_path = self.S3_SOURCES.get(hurricane, self.S3_SOURCES["milton"]) + prefix
 
         print(f"Listing imagery from: {s3_path}")
-        print("(Requires AWS CLI to be installed and configured)")
         print()
 
         try:
-            # List S3 bucket contents (no credentials needed for public buckets)
-            result = subprocess.run(
-                ["aws", "s3", "ls", s3_path, "--no-sign-request"],
-                capture_output=True,
-                text=True
-            )
-
-            if result.returncode == 0:
-                print("Available directories/files:")
-                print(result.stdout)
-            else:
-                print(f"Error: {result.stderr}")
-                print("\nAlternative: View imagery directly at:")
-                print(f"  {self.WEB_VIEWERS.get(hurricane)}")
-
-        except FileNotFoundError:
-            print("AWS CLI not installed. Install with: brew install awscli")
+            listing = self._cached_listing(hurricane, s3_path, max_age_hours)
+        except ImportError:
+            print("boto3 not installed. Install with: pip install boto3")
             print("\nAlternative options:")
             print(f"1. View imagery online: {self.WEB_VIEWERS.get(hurricane)}")
             print("2. Use the ESRI World Imagery fallback in debris_detector.py")
+            return
+        except Exception as e:
+            print(f"Error: {e}")
+            print("\nAlternative: View imagery directly at:")
+            print(f"  {self.WEB_VIEWERS.get(hurricane)}")
+            return
+
+        print("Available directories/files:")
+        for directory in listing["directories"]:
+            print(f"{'PRE':>30} {directory}")
+        for name, size in listing["files"]:
+            print(f"{size:>30} {name}")
+
+    def _cached_listing(self, hurricane, s3_path, max_age_hours):
+        """
+        One level of an S3 prefix, like `aws s3 ls`, cached as JSON.
+
+        Returns:
+            {"directories": [subprefix, ...], "files": [[name, size], ...]}
+        """
+        cache_dir = self.output_dir / ".listing_cache"
+        key = hashlib.blake2b(s3_path.encode(), digest_size=8).hexdigest()
+        cache_path = cache_dir / f"{hurricane}-{key}.json"
+        try:
+            if time.time() - cache_path.stat().st_mtime < max_age_hours * 3600:
+                return json.loads(cache_path.read_text())
+        except (FileNotFoundError, ValueError):
+            pass
+
+        bucket, prefix = split_s3_path(s3_path)
+        listing = {"directories": [], "files": []}
+        paginator = s3_client().get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter="/"):
+            listing["directories"].extend(
+                p["Prefix"][len(prefix):] for p in page.get("CommonPrefixes", [])
+            )
+            listing["files"].extend(
+                [obj["Key"][len(prefix):], obj["Size"]] for obj in page.get("Contents", [])
+            )
+
+        cache_dir.mkdir(exist_ok=True)
+        part = cache_path.with_name(cache_path.name + ".part")
+        part.write_text(json.dumps(listing))
+        os.replace(part, cache_path)
+        return listing
 
-    def download_tiles(self, hurricane="milton", prefix="", max_files=10):
+    def download_tiles(self, hurricane="milton", prefix="", max_files=10,
+                       compress_webp=False, keep_raw=False):
         """
         Download imagery tiles from S3.
 
@@ -77,36 +201,116 @@ class NOAAImageryDownloader:
             hurricane: "milton" or "helene"
             prefix: Subdirectory path within the bucket
             max_files: Maximum number of files to download
+            compress_webp: Re-encode each tile as a tiled, lossless WebP
+                GeoTIFF to shrink the local cache
+            keep_raw: With compress_webp, also keep the original tiles
+                under a raw/ subdirectory
         """
+        try:
+            from boto3.s3.transfer import TransferConfig
+        except ImportError:
+            print("boto3 not installed. Install with: pip install boto3")
+            return
+
         s3_path = self.S3_SOURCES.get(hurricane) + prefix
+        bucket, key_prefix = split_s3_path(s3_path)
+        target_dir = self.output_dir / hurricane / prefix.replace("/", "_")
 
         print(f"Downloading from: {s3_path}")
         print(f"Output directory: {self.output_dir}")
 
+        s3 = s3_client()
+        keys = []
         try:
-            # Sync from S3 (no credentials needed for public buckets)
-            cmd = [
-                "aws", "s3", "sync",
-                s3_path,
-                str(self.output_dir / hurricane / prefix.replace("/", "_")),
-                "--no-sign-request",
-                "--exclude", "*",
-                "--include", "*.tif",
-                "--include", "*.TIF"
-            ]
-
-            result = subprocess.run(cmd, capture_output=True, text=True)
-
-            if result.returncode == 0:
-                print("Download complete!")
-                print(result.stdout)
+            paginator = s3.get_paginator("list_objects_v2")
+            for page in paginator.paginate(Bucket=bucket, Prefix=key_prefix):
+                for obj in page.get("Contents", []):
+                    if obj["Key"].lower().endswith(".tif"):
+                        keys.append((obj["Key"], obj["Size"], obj["ETag"]))
+                if len(keys) >= max_files:
+                    break
+        except Exception as e:
+            print(f"Error: {e}")
+            return
+        keys = keys[:max_files]
+
+        # Tiles over 16 MB are fetched as parallel 16 MB byte-range GETs
+        # written at their offsets; reading each part's body in 1 MB chunks
+        # (default 256 KB) cuts per-read overhead on large tiles
+        transfer = TransferConfig(
+            multipart_threshold=16 * 1024 * 1024,
+            multipart_chunksize=16 * 1024 * 1024,
+            max_concurrency=8,
+            io_chunksize=1024 * 1024,
+        )
+
+        # ETags of the objects downloaded by earlier runs, so a tile that
+        # changed on S3 is fetched again even though a local copy exists
+        index_path = target_dir / ".downloads.json"
+        try:
+            index = json.loads(index_path.read_text())
+        except (FileNotFoundError, ValueError):
+            index = {}
+
+        def download(key, size, etag):
+            name = key[len(key_prefix):].lstrip("/")
+            path = target_dir / name
+            changed = index.get(key, etag) != etag
+            if compress_webp:
+                # Re-encoded tiles are only renamed into place once
+                # complete, so an existing one is never partial
+                if path.exists() and not changed:
+                    return path
+                raw = target_dir / "raw" / name
             else:
-                print(f"Error: {result.stderr}")
-
-        except FileNotFoundError:
-            print("AWS CLI not installed. Install with:")
-            print("  macOS: brew install awscli")
-            print("  pip: pip install awscli")
+                raw = path
+            # Like aws s3 sync: skip files already downloaded in full
+            if changed or not (raw.exists() and raw.stat().st_size == size):
+                raw.parent.mkdir(parents=True, exist_ok=True)
+                part = raw.with_name(raw.name + ".part")
+                # download_file streams each part to disk, so memory stays
+                # flat regardless of tile size (get_object()["Body"].read()
+                # would hold a multi-GB tile in RAM)
+                s3.download_file(bucket, key, str(part), Config=transfer)
+                os.replace(part, raw)
+            if not compress_webp:
+                return path
+
+            part = path.with_name(path.name + ".part")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                _recompress_webp(raw, part)
+            except Exception as e:
+                # GDAL builds without libwebp, or non-8-bit imagery
+                print(f"  Keeping {name} as downloaded (WebP re-encode failed: {e})")
+                part.unlink(missing_ok=True)
+                os.replace(raw, path)
+                return path
+            os.replace(part, path)
+            if not keep_raw:
+                raw.unlink()
+            return path
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = {
+                executor.submit(download, key, size, etag): (key, etag)
+                for key, size, etag in keys
+            }
+            for future, (key, etag) in futures.items():
+                try:
+                    print(f"  {future.result()}")
+                except Exception as e:
+                    print(f"Error downloading {key}: {e}")
+                else:
+                    index[key] = etag
+
+        if futures:
+            target_dir.mkdir(parents=True, exist_ok=True)
+            part = index_path.with_name(index_path.name + ".part")
+            part.write_text(json.dumps(index))
+            os.replace(part, index_path)
+
+        print("Download complete!")
 
     def get_pinellas_county_tiles(self, hurricane="milton"):
         """
@@ -126,8 +330,10 @@ class NOAAImageryDownloader:
         print("  West:  82.9°W (Gulf of Mexico)")
         print()
 
-        # List available tiles
-        self.list_available_imagery(hurricane)
+        # List only the county's UTM zone of the tile grid instead of the
+        # whole event
+        prefix = ard_zone_prefix(*PINELLAS_BBOX)
+        self.list_available_imagery(hurricane, prefix=prefix)
 
         print()
         print("Recommended approach:")
@@ -24,11 +24,21 @@ fi
 echo "Installing dependencies..."
 pip install -r requirements.txt
 
+# Optional: replace Pillow with the SIMD build (faster resize/JPEG in the app)
+if [ "$PILLOW_SIMD" = "1" ]; then
+    echo "Installing pillow-simd..."
+    pip uninstall -y pillow
+    CC="cc -mavx2" pip install --no-cache-dir pillow-simd
+fi
+
 # Test installation
 echo "Testing installation..."
 python3 -c "from samgeo.text_sam import LangSAM; print('LangSAM imported successfully')" 2>/dev/null && \
     echo "✓ SamGeo with text prompts ready" || \
     echo "⚠ Install may need GPU - try Google Colab for full functionality"
+python3 -c "from PIL import features; assert features.check('libjpeg_turbo')" 2>/dev/null && \
+    echo "✓ Pillow uses libjpeg-turbo" || \
+    echo "⚠ Pillow built without libjpeg-turbo - JPEG decoding will be slower"
 
 echo ""
 echo "=================================="
@@ -18,7 +18,8 @@ print("=" * 60)
 
 # Step 1: Download satellite imagery
 print("\n[Step 1] Downloading satellite imagery...")
-from samgeo import tms_to_geotiff
+# Tiles are fetched concurrently; samgeo.tms_to_geotiff downloads them one by one
+from debris_detector import download_tms_geotiff
 
 # Small test area in Clearwater Beach
 # [west, south, east, north]
@@ -29,12 +30,11 @@ image_path = OUTPUT_DIR / "test_satellite.tif"
 print(f"Bounding box: {bbox}")
 print(f"Output: {image_path}")
 
-tms_to_geotiff(
+download_tms_geotiff(
     output=str(image_path),
     bbox=bbox,
     zoom=18,
     source="Satellite",
-    quiet=False
 )
 
 print(f"\nImagery downloaded: {image_path}")
@@ -44,9 +44,9 @@ print(f"File size: {image_path.stat().st_size / 1024 / 1024:.2f} MB")
 print("\n[Step 2] Initializing LangSAM model...")
 print("(This may take a moment to download model weights on first run)")
 
-from samgeo.text_sam import LangSAM
-
-sam = LangSAM()
+# Same model setup as the app (see debris_detector.load_script_model)
+from debris_detector import load_script_model
+sam = load_script_model()
 print("LangSAM ready!")
 
 # Step 3: Run detection
@@ -66,17 +66,20 @@ mask_path = OUTPUT_DIR / "debris_mask.tif"
 sam.save_masks(output=str(mask_path), dtype="uint8")
 print(f"Mask saved: {mask_path}")
 
-# Convert to vector
-vector_path = OUTPUT_DIR / "debris_detected.geojson"
-try:
-    sam.raster_to_vector(str(mask_path), str(vector_path))
+# Convert to vector straight from the in-memory mask, instead of
+# reading the GeoTIFF just written back in with raster_to_vector
+from debris_detector import mask_to_vector
 
-    import geopandas as gpd
-    gdf = gpd.read_file(vector_path)
+vector_path = OUTPUT_DIR / "debris_detected.geojson"
+# Conversion errors are not caught: an empty detection still writes an
+# (empty) GeoJSON, so a failure here is a real bug, not "no debris"
+gdf = mask_to_vector(sam.prediction, str(image_path), str(vector_path))
+assert vector_path.exists(), f"{vector_path} was not written"
+if len(gdf):
     print(f"\nDetected {len(gdf)} potential debris locations")
-    print(f"Results saved: {vector_path}")
-except Exception as e:
-    print(f"No debris detected or error converting: {e}")
+else:
+    print("\nNo debris detected")
+print(f"Results saved: {vector_path}")
 
 # Step 4: Show visual results
 print("\n[Step 4] Generating visualization...")
@@ -96,5 +99,6 @@ print("\n" + "=" * 60)
 print("TEST COMPLETE")
 print("=" * 60)
 print(f"\nOutput files in: {OUTPUT_DIR.absolute()}")
-for f in OUTPUT_DIR.iterdir():
-    print(f"  - {f.name} ({f.stat().st_size / 1024:.1f} KB)")
+with os.scandir(OUTPUT_DIR) as entries:
+    for f in entries:
+        print(f"  - {f.name} ({f.stat(follow_symlinks=False).st_size / 1024:.1f} KB)")
@@ -31,9 +31,9 @@ print(f"File size: {image_path.stat().st_size / 1024:.1f} KB")
 print("\n[Step 1] Initializing LangSAM model...")
 print("(First run downloads ~2.5GB of model weights - this takes a few minutes)")
 
-from samgeo.text_sam import LangSAM
-
-sam = LangSAM()
+# Same model setup as the app (see debris_detector.load_script_model)
+from debris_detector import load_script_model
+sam = load_script_model()
 print("LangSAM ready!")
 
 # Step 2: Run detection with text prompts
@@ -42,51 +42,54 @@ print("\n[Step 2] Running object detection...")
 # Test with common objects first to verify it works
 test_prompts = ["building", "tree", "road"]
 
-for prompt in test_prompts:
-    print(f"\n  Detecting: '{prompt}'...")
-    try:
-        sam.predict(
-            image=str(image_path),
-            text_prompt=prompt,
-            box_threshold=0.24,
-            text_threshold=0.24,
-        )
-
-        # Check if any boxes were found
-        if hasattr(sam, 'boxes') and sam.boxes is not None and len(sam.boxes) > 0:
-            print(f"  Found {len(sam.boxes)} matches for '{prompt}'")
+# One predict call per prompt set: GroundingDINO takes the prompts as a
+# single " . "-separated caption, and each box's phrase maps back to its
+# prompt, so the image goes through the encoders once
+from fast_langsam import combined_caption, match_phrases
+
+def detect_all(prompts, threshold):
+    """Run one combined predict; return the detections' prompt indices."""
+    result = sam.predict(
+        image=str(image_path),
+        text_prompt=combined_caption(prompts),
+        box_threshold=threshold,
+        text_threshold=threshold,
+        return_results=True,
+    )
+    return match_phrases(result[2], prompts) if result is not None else None
+
+print(f"\n  Detecting: {test_prompts}...")
+try:
+    matches = detect_all(test_prompts, 0.24)
+    for i, prompt in enumerate(test_prompts):
+        count = matches.count(i) if matches else 0
+        if count:
+            print(f"  Found {count} matches for '{prompt}'")
         else:
             print(f"  No matches for '{prompt}'")
-
-    except Exception as e:
-        print(f"  Error detecting '{prompt}': {e}")
+except Exception as e:
+    print(f"  Error detecting {test_prompts}: {e}")
 
 # Step 3: Run debris detection specifically
 print("\n[Step 3] Testing debris-specific prompts...")
 debris_prompts = ["debris pile", "rubble", "damaged structure", "construction materials"]
 
-for prompt in debris_prompts:
-    print(f"\n  Detecting: '{prompt}'...")
-    try:
-        sam.predict(
-            image=str(image_path),
-            text_prompt=prompt,
-            box_threshold=0.20,  # Lower threshold for debris
-            text_threshold=0.20,
-        )
-
-        if hasattr(sam, 'boxes') and sam.boxes is not None and len(sam.boxes) > 0:
-            print(f"  Found {len(sam.boxes)} potential matches")
-
-            # Save this result
-            mask_path = OUTPUT_DIR / f"{prompt.replace(' ', '_')}_mask.tif"
-            sam.save_masks(output=str(mask_path), dtype="uint8")
-            print(f"  Saved mask: {mask_path.name}")
-        else:
-            print(f"  No matches (this sample may not contain debris)")
+print(f"\n  Detecting: {debris_prompts}...")
+try:
+    matches = detect_all(debris_prompts, 0.20)  # Lower threshold for debris
+    if matches:
+        for i, prompt in enumerate(debris_prompts):
+            print(f"  '{prompt}': {matches.count(i)} potential matches")
+
+        # Save this result
+        mask_path = OUTPUT_DIR / "debris_mask.tif"
+        sam.save_masks(output=str(mask_path), dtype="uint8")
+        print(f"  Saved mask: {mask_path.name}")
+    else:
+        print(f"  No matches (this sample may not contain debris)")
 
-    except Exception as e:
-        print(f"  Note: {e}")
+except Exception as e:
+    print(f"  Note: {e}")
 
 # Step 4: Save visualization with last successful detection
 print("\n[Step 4] Saving visualization...")
@@ -107,9 +110,10 @@ print("\n" + "=" * 60)
 print("TEST COMPLETE")
 print("=" * 60)
 print(f"\nOutput files in: {OUTPUT_DIR.absolute()}")
-for f in OUTPUT_DIR.iterdir():
-    size_kb = f.stat().st_size / 1024
-    print(f"  - {f.name} ({size_kb:.1f} KB)")
+with os.scandir(OUTPUT_DIR) as entries:
+    for f in entries:
+        size_kb = f.stat(follow_symlinks=False).st_size / 1024
+        print(f"  - {f.name} ({size_kb:.1f} KB)")
 
 print("\n" + "-" * 60)
 print("NEXT STEPS:")
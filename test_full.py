@@ -17,7 +17,8 @@ print("=" * 60)
 
 # Step 1: Download real satellite imagery using GDAL
 print("\n[Step 1] Downloading satellite imagery...")
-from samgeo import tms_to_geotiff
+# Tiles are fetched concurrently; samgeo.tms_to_geotiff downloads them one by one
+from debris_detector import download_tms_geotiff
 
 # Small area in Clearwater Beach [west, south, east, north]
 bbox = [-82.828, 27.972, -82.822, 27.978]
@@ -26,12 +27,11 @@ image_path = OUTPUT_DIR / "clearwater_satellite.tif"
 print(f"Area: Clearwater Beach, FL")
 print(f"Bbox: {bbox}")
 
-tms_to_geotiff(
+download_tms_geotiff(
     output=str(image_path),
     bbox=bbox,
     zoom=18,
     source="Satellite",
-    quiet=False
 )
 
 print(f"\nImagery saved: {image_path}")
@@ -39,8 +39,9 @@ print(f"File size: {image_path.stat().st_size / 1024 / 1024:.2f} MB")
 
 # Step 2: Initialize LangSAM
 print("\n[Step 2] Initializing LangSAM...")
-from samgeo.text_sam import LangSAM
-sam = LangSAM()
+# Same model setup as the app (see debris_detector.load_script_model)
+from debris_detector import load_script_model
+sam = load_script_model()
 print("LangSAM ready!")
 
 # Step 3: Detect objects
@@ -78,21 +79,29 @@ else:
 print("\n[Step 4] Testing debris detection...")
 debris_prompts = ["debris", "rubble", "pile"]
 
-for prompt in debris_prompts:
-    print(f"  Trying: '{prompt}'...")
-    try:
-        sam.predict(
-            image=str(image_path),
-            text_prompt=prompt,
-            box_threshold=0.20,
-            text_threshold=0.20,
-        )
-        if hasattr(sam, 'boxes') and sam.boxes is not None and len(sam.boxes) > 0:
-            print(f"    Found {len(sam.boxes)} matches!")
+# One predict call for all prompts: GroundingDINO takes them as a single
+# " . "-separated caption, and each box's phrase maps back to its prompt
+from fast_langsam import combined_caption, match_phrases
+
+print(f"  Trying: {debris_prompts}...")
+try:
+    result = sam.predict(
+        image=str(image_path),
+        text_prompt=combined_caption(debris_prompts),
+        box_threshold=0.20,
+        text_threshold=0.20,
+        return_results=True,
+    )
+    phrases = result[2] if result is not None else []
+    matches = match_phrases(phrases, debris_prompts)
+    for i, prompt in enumerate(debris_prompts):
+        count = matches.count(i)
+        if count:
+            print(f"    '{prompt}': found {count} matches!")
         else:
-            print(f"    No matches (image may not contain debris)")
-    except Exception as e:
-        print(f"    Error: {e}")
+            print(f"    '{prompt}': no matches (image may not contain debris)")
+except Exception as e:
+    print(f"    Error: {e}")
 
 # Step 5: Save visualization
 print("\n[Step 5] Saving visualization...")
@@ -112,5 +121,6 @@ print("\n" + "=" * 60)
 print("TEST COMPLETE")
 print("=" * 60)
 print(f"\nFiles in {OUTPUT_DIR}:")
-for f in sorted(OUTPUT_DIR.iterdir()):
-    print(f"  - {f.name} ({f.stat().st_size / 1024:.1f} KB)")
+with os.scandir(OUTPUT_DIR) as entries:
+    for f in sorted(entries, key=lambda e: e.name):
+        print(f"  - {f.name} ({f.stat(follow_symlinks=False).st_size / 1024:.1f} KB)")
@@ -0,0 +1,48 @@
+"""
+Test mask_to_vector on a LangSAM-style mask
+Runs offline on a tiny synthetic GeoTIFF: python -m pytest test_mask_to_vector.py
+"""
+
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+gpd = pytest.importorskip("geopandas")
+
+from rasterio.transform import from_origin
+
+from debris_detector import mask_to_vector
+
+
+def write_source(path, size=32):
+    """Write a small georeferenced RGB GeoTIFF to predict "on"."""
+    with rasterio.open(
+        path, "w", driver="GTiff", width=size, height=size, count=3,
+        dtype="uint8", crs="EPSG:3857", transform=from_origin(0, 0, 1, 1),
+    ) as dst:
+        dst.write(np.zeros((3, size, size), dtype=np.uint8))
+
+
+def test_int64_mask(tmp_path):
+    # samgeo builds LangSAM.prediction as (mask > 0) * 255, which is int64
+    source = tmp_path / "source.tif"
+    write_source(source)
+    mask = np.zeros((32, 32), dtype=np.int64)
+    mask[4:10, 4:10] = 255
+    mask[20:28, 16:30] = 255
+
+    output = tmp_path / "debris.geojson"
+    gdf = mask_to_vector(mask, source, output)
+
+    assert len(gdf) == 2
+    assert output.exists() and output.with_suffix(".gpkg").exists()
+    assert len(gpd.read_file(output)) == 2
+
+
+def test_empty_mask(tmp_path):
+    source = tmp_path / "source.tif"
+    write_source(source)
+
+    gdf = mask_to_vector(np.zeros((32, 32), dtype=np.int64), source, tmp_path / "debris.gpkg")
+
+    assert len(gdf) == 0